@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, MappedAsDataclass
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import String, Integer, Boolean, DateTime, ForeignKey, Enum as SQLEnum
 from typing import List, Optional
 from datetime import datetime
 import enum
@@ -33,17 +33,27 @@ class Agent(Base):
     Telephone: Mapped[str] = mapped_column(String(15), unique=True)
     agent_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, init=False)
     Enregistrement_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    version: Mapped[int] = mapped_column(Integer, default=1, init=False)
+    Date_modification: Mapped[datetime] = mapped_column(DateTime, insert_default=datetime.now, init=False)
+    # Suppression logique en attente de purge (agents avec beaucoup de tickets)
+    Supprime: Mapped[bool] = mapped_column(Boolean, default=False, init=False, index=True)
     
     
+    # passive_deletes : la suppression des tickets (et de leurs événements) est
+    # faite par la base (ON DELETE CASCADE), sans les charger en mémoire
     tickets: Mapped[List["Ticket"]] = relationship(
         back_populates="agent",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         default_factory=list,
         init=False
     )
     
+    # Pas de cascade depuis l'agent : ses événements sur les tickets d'autres
+    # agents appartiennent à l'historique de ces tickets (suppression refusée)
     events: Mapped[List["Event_ticket"]] = relationship(
         back_populates="agent",
+        passive_deletes="all",
         default_factory=list,
         init=False
     )
@@ -55,9 +65,11 @@ class Ticket(Base):
     
     Categorie_service: Mapped[str] = mapped_column(String(50))
     Description: Mapped[str] = mapped_column(String(500))
-    Agent_id: Mapped[int] = mapped_column(ForeignKey("agent.agent_id"))
+    Agent_id: Mapped[int] = mapped_column(ForeignKey("agent.agent_id", ondelete="CASCADE"), index=True)
     Ticket_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, init=False)
     Date_: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    version: Mapped[int] = mapped_column(Integer, default=1, init=False)
+    Date_modification: Mapped[datetime] = mapped_column(DateTime, insert_default=datetime.now, init=False)
     
     
     agent: Mapped["Agent"] = relationship(
@@ -68,6 +80,7 @@ class Ticket(Base):
     event_tickets: Mapped[List["Event_ticket"]] = relationship(
         back_populates="ticket",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         default_factory=list,
         init=False
     )
@@ -79,7 +92,8 @@ class Event_ticket(Base):
 
     statut: Mapped[StatutEnum] = mapped_column(SQLEnum(StatutEnum), nullable=False)
     Agent_id: Mapped[int] = mapped_column(ForeignKey("agent.agent_id"), primary_key=True)
-    Ticket_id: Mapped[int] = mapped_column(ForeignKey("ticket.Ticket_id"), primary_key=True)
+    # Index dédié : la clé primaire commence par Agent_id et ne sert pas aux cascades par ticket
+    Ticket_id: Mapped[int] = mapped_column(ForeignKey("ticket.Ticket_id", ondelete="CASCADE"), primary_key=True, index=True)
     Date_event: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
     
    
@@ -91,4 +105,13 @@ class Event_ticket(Base):
     ticket: Mapped["Ticket"] = relationship(
         back_populates="event_tickets",
         init=False
-    )
\ No newline at end of file
+    )
+
+
+class Version_collection(Base):
+    __tablename__ = "version_collection"
+    
+
+    Nom: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    Date_modification: Mapped[datetime] = mapped_column(DateTime, default_factory=datetime.now)
\ No newline at end of file
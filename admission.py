@@ -0,0 +1,88 @@
+from fastapi import HTTPException, Request, status
+import asyncio
+
+
+class AdmissionLimiter:
+    """Limite de concurrence avec file d'attente bornée pour les routes d'écriture.
+
+    Au-delà de max_concurrent écritures simultanées, les requêtes attendent dans
+    une file d'au plus max_queue places (et au plus queue_timeout secondes) ;
+    si la file est pleine ou l'attente trop longue, la requête est rejetée
+    immédiatement en 503 avec Retry-After, au lieu de s'empiler derrière le
+    verrou d'écriture de SQLite.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.en_cours = 0
+        self.en_attente = 0
+        self.attente_max_observee = 0
+        self.admises = 0
+        self.rejets_file_pleine = 0
+        self.rejets_delai = 0
+
+    def _reject(self, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    async def acquire(self) -> None:
+        """Obtenir une place d'écriture ou lever une HTTPException 503"""
+        if not self._semaphore.locked():
+            # Place libre : acquire() la prend sans rendre la main à la boucle, les
+            # requêtes arrivées dans le même tour voient donc le sémaphore pris
+            await self._semaphore.acquire()
+            self.en_cours += 1
+            self.admises += 1
+            return
+
+        # Seules les requêtes qui attendent réellement occupent la file
+        if self.en_attente >= self.max_queue:
+            self.rejets_file_pleine += 1
+            raise self._reject("Serveur surchargé, réessayer plus tard")
+
+        self.en_attente += 1
+        self.attente_max_observee = max(self.attente_max_observee, self.en_attente)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejets_delai += 1
+            raise self._reject("Délai d'attente dépassé, réessayer plus tard")
+        finally:
+            self.en_attente -= 1
+
+        self.en_cours += 1
+        self.admises += 1
+
+    def release(self) -> None:
+        self.en_cours -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        """Profondeur de file et compteurs de rejets"""
+        return {
+            "en_cours": self.en_cours,
+            "en_attente": self.en_attente,
+            "attente_max_observee": self.attente_max_observee,
+            "admises": self.admises,
+            "rejets_file_pleine": self.rejets_file_pleine,
+            "rejets_delai": self.rejets_delai,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue
+        }
+
+
+# Dépendance à placer sur les routes d'écriture
+async def write_admission(request: Request):
+    limiter: AdmissionLimiter = request.app.state.admission
+    await limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release()
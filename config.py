@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+import os
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Paramètres de l'application, lus depuis les variables d'environnement"""
+    database_url: str = "sqlite:///./agence_tickets.db"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    jobs_dir: str = "./jobs"
+    jobs_max_workers: int = 2
+    jobs_ttl: int = 24 * 3600
+    jobs_heartbeat_timeout: int = 60
+    write_max_concurrent: int = 4
+    write_max_queue: int = 32
+    write_queue_timeout: float = 5.0
+    write_retry_after: int = 1
+    purge_threshold: int = 5000
+    purge_batch_size: int = 1000
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Construire les paramètres depuis l'environnement (valeurs par défaut sinon)"""
+        return cls(
+            database_url=os.getenv("DATABASE_URL", cls.database_url),
+            pool_size=int(os.getenv("DB_POOL_SIZE", cls.pool_size)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", cls.max_overflow)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", cls.pool_timeout)),
+            jobs_dir=os.getenv("JOBS_DIR", cls.jobs_dir),
+            jobs_max_workers=int(os.getenv("JOBS_MAX_WORKERS", cls.jobs_max_workers)),
+            jobs_ttl=int(os.getenv("JOBS_TTL", cls.jobs_ttl)),
+            jobs_heartbeat_timeout=int(os.getenv("JOBS_HEARTBEAT_TIMEOUT", cls.jobs_heartbeat_timeout)),
+            write_max_concurrent=int(os.getenv("WRITE_MAX_CONCURRENT", cls.write_max_concurrent)),
+            write_max_queue=int(os.getenv("WRITE_MAX_QUEUE", cls.write_max_queue)),
+            write_queue_timeout=float(os.getenv("WRITE_QUEUE_TIMEOUT", cls.write_queue_timeout)),
+            write_retry_after=int(os.getenv("WRITE_RETRY_AFTER", cls.write_retry_after)),
+            purge_threshold=int(os.getenv("PURGE_THRESHOLD", cls.purge_threshold)),
+            purge_batch_size=int(os.getenv("PURGE_BATCH_SIZE", cls.purge_batch_size))
+        )
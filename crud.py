@@ -1,11 +1,35 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
-from typing import List, Optional
+from sqlalchemy import and_, or_, desc, func, literal_column, select
+from sqlalchemy.exc import IntegrityError
+from cachetools import TTLCache
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, date
+import threading
 
 import Model, schemas
 
 
+# Cache (par processus) agent_id -> catégorie, pour les vérifications
+# d'existence des chemins d'écriture des tickets. Une invalidation n'est vue que
+# par le processus qui écrit : la durée de vie borne le temps pendant lequel un
+# autre worker garde un agent supprimé, et la clé étrangère rattrape les
+# écritures faites entre-temps (_commit_ecriture_agent).
+AGENT_CACHE_SIZE = 4096
+AGENT_CACHE_TTL = 30  # secondes
+
+_agent_cache = TTLCache(maxsize=AGENT_CACHE_SIZE, ttl=AGENT_CACHE_TTL)
+_agent_cache_lock = threading.Lock()
+_agent_cache_stats = {"succes": 0, "echecs": 0, "invalidations": 0}
+_agent_cache_generation = 0
+
+# Les agents supprimés logiquement (en attente de purge) et leurs tickets
+# sont masqués de toutes les lectures
+_AGENT_ACTIF = Model.Agent.Supprime.is_(False)
+_TICKET_VISIBLE = Model.Ticket.Agent_id.notin_(
+    select(Model.Agent.agent_id).where(Model.Agent.Supprime.is_(True))
+)
+
+
 #CRUD AGENTS
 
 def create_agent(db: Session, agent: schemas.AgentCreate) -> Model.Agent:
@@ -20,6 +44,7 @@ def create_agent(db: Session, agent: schemas.AgentCreate) -> Model.Agent:
         Telephone=agent.Telephone
     )
     db.add(db_agent)
+    bump_collection_version(db, "agent")
     db.commit()
     db.refresh(db_agent)
     return db_agent
@@ -27,7 +52,65 @@ def create_agent(db: Session, agent: schemas.AgentCreate) -> Model.Agent:
 
 def get_agent(db: Session, agent_id: int) -> Optional[Model.Agent]:
     """Récupérer un agent par son ID"""
-    return db.query(Model.Agent).filter(Model.Agent.agent_id == agent_id).first()
+    return db.query(Model.Agent).filter(Model.Agent.agent_id == agent_id, _AGENT_ACTIF).first()
+
+
+def get_agent_categorie(db: Session, agent_id: int) -> Optional[Model.CategorieEnum]:
+    """Récupérer la catégorie d'un agent via le cache (None si l'agent n'existe pas)"""
+    with _agent_cache_lock:
+        categorie = _agent_cache.get(agent_id)
+        if categorie is not None:
+            _agent_cache_stats["succes"] += 1
+            return categorie
+        _agent_cache_stats["echecs"] += 1
+        generation = _agent_cache_generation
+    
+    categorie = db.query(Model.Agent.Categorie).filter(
+        Model.Agent.agent_id == agent_id, _AGENT_ACTIF
+    ).scalar()
+    if categorie is not None:
+        with _agent_cache_lock:
+            # Ne pas remettre en cache une valeur lue avant une invalidation concurrente
+            if generation == _agent_cache_generation:
+                _agent_cache[agent_id] = categorie
+    return categorie
+
+
+def agent_exists(db: Session, agent_id: int) -> bool:
+    """Vérifier qu'un agent existe (via le cache)"""
+    return get_agent_categorie(db, agent_id) is not None
+
+
+def invalidate_agent_cache(agent_id: int) -> None:
+    """Retirer un agent du cache après modification ou suppression"""
+    global _agent_cache_generation
+    with _agent_cache_lock:
+        _agent_cache.pop(agent_id, None)
+        _agent_cache_generation += 1
+        _agent_cache_stats["invalidations"] += 1
+
+
+
+def _commit_ecriture_agent(db: Session, agent_id: int) -> None:
+    """Valider une écriture qui référence un agent vérifié via le cache"""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        # Agent supprimé (par un autre worker) depuis sa mise en cache
+        db.rollback()
+        invalidate_agent_cache(agent_id)
+        if not agent_exists(db, agent_id):
+            raise ValueError(f"Agent avec ID {agent_id} n'existe pas") from e
+        raise ValueError(f"Écriture refusée par la base : {e.orig}") from e
+
+def get_agent_cache_stats() -> dict:
+    """Compteurs du cache des agents"""
+    with _agent_cache_lock:
+        return {
+            **_agent_cache_stats,
+            "taille": len(_agent_cache),
+            "taille_max": _agent_cache.maxsize
+        }
 
 
 def get_agent_by_email(db: Session, email: str) -> Optional[Model.Agent]:
@@ -43,7 +126,43 @@ def get_agents(
     search: Optional[str] = None
 ) -> List[Model.Agent]:
     """Récupérer la liste des agents avec filtres optionnels"""
-    query = db.query(Model.Agent)
+    query = _filter_agents(db.query(Model.Agent), categorie, search)
+    return query.offset(skip).limit(limit).all()
+
+
+def get_agents_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    categorie: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> List[dict]:
+    """Récupérer les agents sous forme de lignes (colonnes demandées uniquement)"""
+    columns = _select_columns(Model.Agent, schemas.Agent, fields)
+    query = _filter_agents(db.query(*columns), categorie, search)
+    return [row._asdict() for row in query.offset(skip).limit(limit)]
+
+
+def get_agents_by_ids(db: Session, agent_ids: List[int]) -> Dict[int, Optional[dict]]:
+    """Récupérer plusieurs agents en une requête, indexés par ID (None si inexistant)"""
+    columns = _select_columns(Model.Agent, schemas.Agent)
+    agents = dict.fromkeys(agent_ids)
+    for row in db.query(*columns).filter(Model.Agent.agent_id.in_(agent_ids), _AGENT_ACTIF):
+        agents[row.agent_id] = row._asdict()
+    return agents
+
+
+def get_agent_ids(db: Session) -> List[int]:
+    """Récupérer les identifiants des agents actifs, par ordre croissant"""
+    return [
+        row.agent_id for row in db.query(Model.Agent.agent_id).filter(_AGENT_ACTIF).order_by(Model.Agent.agent_id)
+    ]
+
+
+def _filter_agents(query, categorie: Optional[str], search: Optional[str]):
+    """Appliquer les filtres communs aux listes d'agents"""
+    query = query.filter(_AGENT_ACTIF)
     
     # Filtrer par catégorie
     if categorie:
@@ -58,7 +177,19 @@ def get_agents(
         )
         query = query.filter(search_filter)
     
-    return query.offset(skip).limit(limit).all()
+    return query
+
+
+def _select_columns(model, schema, fields: Optional[List[str]] = None) -> list:
+    """Colonnes exposées par le schéma à sélectionner (toutes si aucun champ n'est demandé)"""
+    columns = model.__table__.c
+    if not fields:
+        return [columns[field] for field in schema.model_fields]
+    
+    inconnus = [field for field in fields if field not in schema.model_fields]
+    if inconnus:
+        raise ValueError(f"Champs inconnus : {', '.join(inconnus)}")
+    return [columns[field] for field in fields]
 
 
 def update_agent(db: Session, agent_id: int, agent_update: schemas.AgentUpdate) -> Optional[Model.Agent]:
@@ -71,22 +202,109 @@ def update_agent(db: Session, agent_id: int, agent_update: schemas.AgentUpdate)
     for field, value in update_data.items():
         setattr(db_agent, field, value)
     
+    _bump_version(db_agent)
+    bump_collection_version(db, "agent")
     db.commit()
+    invalidate_agent_cache(agent_id)
     db.refresh(db_agent)
     return db_agent
 
 
 def delete_agent(db: Session, agent_id: int) -> bool:
-    """Supprimer un agent"""
+    """Supprimer un agent (ses tickets et leurs événements supprimés par la base, ON DELETE CASCADE)"""
     db_agent = get_agent(db, agent_id)
     if not db_agent:
         return False
     
     db.delete(db_agent)
+    bump_collection_version(db, "agent")
+    bump_collection_version(db, "ticket")
+    bump_collection_version(db, "suppression")
     db.commit()
+    invalidate_agent_cache(agent_id)
     return True
 
 
+def soft_delete_agent(db: Session, agent_id: int) -> bool:
+    """Supprimer logiquement un agent ; ses données sont effacées par purge_deleted_agents"""
+    db_agent = get_agent(db, agent_id)
+    if not db_agent:
+        return False
+    
+    db_agent.Supprime = True
+    _bump_version(db_agent)
+    bump_collection_version(db, "agent")
+    bump_collection_version(db, "ticket")
+    bump_collection_version(db, "suppression")
+    db.commit()
+    invalidate_agent_cache(agent_id)
+    return True
+
+
+def count_agent_tickets(db: Session, agent_id: int) -> int:
+    """Compter les tickets d'un agent"""
+    return db.query(func.count(Model.Ticket.Ticket_id)).filter(
+        Model.Ticket.Agent_id == agent_id
+    ).scalar()
+
+
+def count_agent_foreign_events(db: Session, agent_id: int) -> int:
+    """Compter les événements enregistrés par un agent sur les tickets d'autres agents"""
+    return db.query(func.count()).select_from(Model.Event_ticket).join(
+        Model.Ticket, Model.Ticket.Ticket_id == Model.Event_ticket.Ticket_id
+    ).filter(
+        Model.Event_ticket.Agent_id == agent_id, Model.Ticket.Agent_id != agent_id
+    ).scalar()
+
+
+def purge_deleted_agents(
+    db: Session,
+    agent_id: Optional[int] = None,
+    batch_size: int = 1000,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """Effacer par lots les agents supprimés logiquement (tous, ou seulement agent_id),
+    leurs tickets et événements"""
+    query = db.query(Model.Agent.agent_id).filter(Model.Agent.Supprime.is_(True))
+    if agent_id is not None:
+        query = query.filter(Model.Agent.agent_id == agent_id)
+    agent_ids = [row.agent_id for row in query]
+    total = db.query(func.count(Model.Ticket.Ticket_id)).filter(
+        Model.Ticket.Agent_id.in_(agent_ids)
+    ).scalar()
+    
+    purges = 0
+    for agent_id in agent_ids:
+        # Un commit par lot : le verrou d'écriture est relâché entre deux lots
+        while True:
+            ticket_ids = [
+                row.Ticket_id for row in db.query(Model.Ticket.Ticket_id).filter(
+                    Model.Ticket.Agent_id == agent_id
+                ).limit(batch_size)
+            ]
+            if not ticket_ids:
+                break
+            db.query(Model.Event_ticket).filter(
+                Model.Event_ticket.Ticket_id.in_(ticket_ids)
+            ).delete(synchronize_session=False)
+            db.query(Model.Ticket).filter(
+                Model.Ticket.Ticket_id.in_(ticket_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+            purges += len(ticket_ids)
+            if on_progress:
+                on_progress(purges, total)
+        
+        # Les événements de l'agent sur d'autres tickets sont conservés : s'il en a
+        # enregistré depuis la demande de suppression, il reste masqué sans être effacé
+        try:
+            db.query(Model.Agent).filter(Model.Agent.agent_id == agent_id).delete(synchronize_session=False)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    return purges
+
+
 def get_agent_statistics(db: Session, agent_id: int) -> dict:
     """Récupérer les statistiques d'un agent"""
     agent = get_agent(db, agent_id)
@@ -119,8 +337,7 @@ def get_agent_statistics(db: Session, agent_id: int) -> dict:
 def create_ticket(db: Session, ticket: schemas.TicketCreate) -> Model.Ticket:
     """Créer un nouveau ticket"""
     # Vérifier que l'agent existe
-    agent = get_agent(db, ticket.Agent_id)
-    if not agent:
+    if not agent_exists(db, ticket.Agent_id):
         raise ValueError(f"Agent avec ID {ticket.Agent_id} n'existe pas")
     
     db_ticket = Model.Ticket(
@@ -130,7 +347,8 @@ def create_ticket(db: Session, ticket: schemas.TicketCreate) -> Model.Ticket:
         Agent_id=ticket.Agent_id
     )
     db.add(db_ticket)
-    db.commit()
+    bump_collection_version(db, "ticket")
+    _commit_ecriture_agent(db, ticket.Agent_id)
     db.refresh(db_ticket)
     
     # Dans cette partie nous avons la création de  l'événement initial "en_attente"
@@ -146,7 +364,7 @@ def create_ticket(db: Session, ticket: schemas.TicketCreate) -> Model.Ticket:
 
 def get_ticket(db: Session, ticket_id: int) -> Optional[Model.Ticket]:
     """Récupérer un ticket par son ID"""
-    return db.query(Model.Ticket).filter(Model.Ticket.Ticket_id == ticket_id).first()
+    return db.query(Model.Ticket).filter(Model.Ticket.Ticket_id == ticket_id, _TICKET_VISIBLE).first()
 
 
 def get_tickets(
@@ -160,7 +378,62 @@ def get_tickets(
     statut: Optional[str] = None
 ) -> List[Model.Ticket]:
     """Récupérer la liste des tickets avec filtres"""
-    query = db.query(Model.Ticket)
+    query = _filter_tickets(
+        db, db.query(Model.Ticket), categorie, agent_id, date_debut, date_fin, statut
+    )
+    return query.offset(skip).limit(limit).all()
+
+
+def get_tickets_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    categorie: Optional[str] = None,
+    agent_id: Optional[int] = None,
+    date_debut: Optional[date] = None,
+    date_fin: Optional[date] = None,
+    statut: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> List[dict]:
+    """Récupérer les tickets sous forme de lignes (colonnes demandées uniquement)"""
+    columns = _select_columns(Model.Ticket, schemas.Ticket, fields)
+    query = _filter_tickets(
+        db, db.query(*columns), categorie, agent_id, date_debut, date_fin, statut
+    )
+    return [row._asdict() for row in query.offset(skip).limit(limit)]
+
+
+def get_tickets_by_ids(db: Session, ticket_ids: List[int]) -> Dict[int, Optional[dict]]:
+    """Récupérer plusieurs tickets en une requête, indexés par ID (None si inexistant)"""
+    columns = _select_columns(Model.Ticket, schemas.Ticket)
+    tickets = dict.fromkeys(ticket_ids)
+    for row in db.query(*columns).filter(Model.Ticket.Ticket_id.in_(ticket_ids), _TICKET_VISIBLE):
+        tickets[row.Ticket_id] = row._asdict()
+    return tickets
+
+
+def count_tickets(db: Session) -> int:
+    """Compter les tickets visibles"""
+    return db.query(func.count(Model.Ticket.Ticket_id)).filter(_TICKET_VISIBLE).scalar()
+
+
+def iter_tickets_rows(db: Session, fields: List[str], batch_size: int = 1000):
+    """Parcourir tous les tickets visibles par lots, dans l'ordre des identifiants"""
+    columns = _select_columns(Model.Ticket, schemas.Ticket, fields)
+    return db.query(*columns).filter(_TICKET_VISIBLE).order_by(Model.Ticket.Ticket_id).yield_per(batch_size)
+
+
+def _filter_tickets(
+    db: Session,
+    query,
+    categorie: Optional[str],
+    agent_id: Optional[int],
+    date_debut: Optional[date],
+    date_fin: Optional[date],
+    statut: Optional[str]
+):
+    """Appliquer les filtres et le tri communs aux listes de tickets"""
+    query = query.filter(_TICKET_VISIBLE)
     
     # Filtrer par catégorie de service
     if categorie:
@@ -192,7 +465,7 @@ def get_tickets(
             Model.Ticket.Ticket_id == latest_events.c.Ticket_id
         ).filter(latest_events.c.statut == statut)
     
-    return query.order_by(desc(Model.Ticket.Date_)).offset(skip).limit(limit).all()
+    return query.order_by(desc(Model.Ticket.Date_))
 
 
 def update_ticket(db: Session, ticket_id: int, ticket_update: schemas.TicketUpdate) -> Optional[Model.Ticket]:
@@ -202,10 +475,14 @@ def update_ticket(db: Session, ticket_id: int, ticket_update: schemas.TicketUpda
         return None
     
     update_data = ticket_update.dict(exclude_unset=True)
+    if "Agent_id" in update_data and not agent_exists(db, update_data["Agent_id"]):
+        raise ValueError(f"Agent avec ID {update_data['Agent_id']} n'existe pas")
     for field, value in update_data.items():
         setattr(db_ticket, field, value)
     
-    db.commit()
+    _bump_version(db_ticket)
+    bump_collection_version(db, "ticket")
+    _commit_ecriture_agent(db, db_ticket.Agent_id)
     db.refresh(db_ticket)
     return db_ticket
 
@@ -217,6 +494,8 @@ def delete_ticket(db: Session, ticket_id: int) -> bool:
         return False
     
     db.delete(db_ticket)
+    bump_collection_version(db, "ticket")
+    bump_collection_version(db, "suppression")
     db.commit()
     return True
 
@@ -230,6 +509,33 @@ def get_ticket_current_status(db: Session, ticket_id: int) -> Optional[Model.Sta
     return latest_event.statut if latest_event else None
 
 
+def get_tickets_current_status(db: Session, ticket_ids: List[int]) -> Dict[int, Optional[dict]]:
+    """Récupérer le statut actuel de plusieurs tickets en une requête (None si ticket inexistant)"""
+    # Date du dernier événement de chaque ticket demandé
+    latest = db.query(
+        Model.Event_ticket.Ticket_id,
+        func.max(Model.Event_ticket.Date_event).label("Date_event")
+    ).filter(
+        Model.Event_ticket.Ticket_id.in_(ticket_ids)
+    ).group_by(Model.Event_ticket.Ticket_id).subquery()
+    
+    # Jointure externe : un ticket sans événement garde un statut None
+    rows = db.query(Model.Ticket.Ticket_id, Model.Event_ticket.statut).outerjoin(
+        latest, Model.Ticket.Ticket_id == latest.c.Ticket_id
+    ).outerjoin(
+        Model.Event_ticket,
+        and_(
+            Model.Event_ticket.Ticket_id == latest.c.Ticket_id,
+            Model.Event_ticket.Date_event == latest.c.Date_event
+        )
+    ).filter(Model.Ticket.Ticket_id.in_(ticket_ids), _TICKET_VISIBLE)
+    
+    statuts = dict.fromkeys(ticket_ids)
+    for row in rows:
+        statuts[row.Ticket_id] = {"ticket_id": row.Ticket_id, "statut_actuel": row.statut}
+    return statuts
+
+
 # CRUD EVENTS TICKETS
 
 def create_ticket_event(
@@ -240,9 +546,10 @@ def create_ticket_event(
 ) -> Model.Event_ticket:
     """Créer un nouvel événement pour un ticket"""
     # Vérifier que l'agent et le ticket existent
-    if not get_agent(db, agent_id):
+    if not agent_exists(db, agent_id):
         raise ValueError(f"Agent avec ID {agent_id} n'existe pas")
-    if not get_ticket(db, ticket_id):
+    db_ticket = get_ticket(db, ticket_id)
+    if not db_ticket:
         raise ValueError(f"Ticket avec ID {ticket_id} n'existe pas")
     
     db_event = Model.Event_ticket(
@@ -252,7 +559,10 @@ def create_ticket_event(
         statut=statut
     )
     db.add(db_event)
-    db.commit()
+    # Le statut courant fait partie de l'état du ticket (filtre ?statut= des listes)
+    _bump_version(db_ticket)
+    bump_collection_version(db, "ticket")
+    _commit_ecriture_agent(db, agent_id)
     db.refresh(db_event)
     return db_event
 
@@ -264,6 +574,29 @@ def get_ticket_events(db: Session, ticket_id: int) -> List[Model.Event_ticket]:
     ).order_by(Model.Event_ticket.Date_event).all()
 
 
+# Rowid SQLite de event_ticket : croissant dans l'ordre des commits (un seul
+# écrivain à la fois), tant que la dernière ligne n'est pas supprimée
+_EVENT_ROWID = literal_column("event_ticket.rowid")
+
+
+def get_event_log(db: Session, apres_rowid: Optional[int] = None) -> list:
+    """Récupérer le journal des événements (Ticket_id, Agent_id, Date_event, statut, rowid)
+    des tickets visibles, éventuellement limité aux lignes insérées après apres_rowid"""
+    query = db.query(
+        Model.Event_ticket.Ticket_id,
+        Model.Event_ticket.Agent_id,
+        Model.Event_ticket.Date_event,
+        Model.Event_ticket.statut,
+        _EVENT_ROWID
+    ).join(
+        Model.Ticket, Model.Ticket.Ticket_id == Model.Event_ticket.Ticket_id
+    ).filter(_TICKET_VISIBLE)
+    
+    if apres_rowid is not None:
+        query = query.filter(_EVENT_ROWID > apres_rowid)
+    return query.all()
+
+
 def update_ticket_status(
     db: Session, 
     ticket_id: int, 
@@ -277,7 +610,7 @@ def update_ticket_status(
         raise ValueError(f"Ticket avec ID {ticket_id} n'existe pas")
     
     # Vérifier que l'agent existe
-    if not get_agent(db, agent_id):
+    if not agent_exists(db, agent_id):
         raise ValueError(f"Agent avec ID {agent_id} n'existe pas")
     
     # Récupérer le statut actuel
@@ -304,26 +637,83 @@ def is_valid_status_transition(statut_actuel: Optional[Model.StatutEnum], nouvea
     return nouveau_statut in transitions_valides.get(statut_actuel, [])
 
 
+# VERSIONS (ETag / requêtes conditionnelles)
+
+def _bump_version(entity) -> None:
+    """Incrémenter le compteur de version d'un agent ou d'un ticket"""
+    # Incrément fait par la base (SET version = version + 1) : deux écritures
+    # concurrentes ne peuvent pas produire la même version
+    entity.version = type(entity).version + 1
+    entity.Date_modification = datetime.now()
+
+
+def bump_collection_version(db: Session, nom: str) -> None:
+    """Incrémenter le compteur global d'une collection (dans la transaction en cours).
+
+    Collections : "agent", "ticket" (tickets et événements) et "suppression"
+    (toute suppression de tickets ou d'événements, voir snapshot.py).
+    """
+    maintenant = datetime.now()
+    updated = db.query(Model.Version_collection).filter(
+        Model.Version_collection.Nom == nom
+    ).update(
+        {
+            Model.Version_collection.version: Model.Version_collection.version + 1,
+            Model.Version_collection.Date_modification: maintenant
+        },
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(Model.Version_collection(Nom=nom, version=1, Date_modification=maintenant))
+
+
+def get_collection_version(db: Session, nom: str) -> Tuple[int, Optional[datetime]]:
+    """Récupérer (version, date de modification) d'une collection"""
+    row = db.query(
+        Model.Version_collection.version,
+        Model.Version_collection.Date_modification
+    ).filter(Model.Version_collection.Nom == nom).first()
+    return (row.version, row.Date_modification) if row else (0, None)
+
+
+def get_agent_version(db: Session, agent_id: int) -> Optional[Tuple[int, datetime]]:
+    """Récupérer (version, date de modification) d'un agent sans le charger"""
+    row = db.query(Model.Agent.version, Model.Agent.Date_modification).filter(
+        Model.Agent.agent_id == agent_id, _AGENT_ACTIF
+    ).first()
+    return (row.version, row.Date_modification) if row else None
+
+
+def get_ticket_version(db: Session, ticket_id: int) -> Optional[Tuple[int, datetime]]:
+    """Récupérer (version, date de modification) d'un ticket sans le charger"""
+    row = db.query(Model.Ticket.version, Model.Ticket.Date_modification).filter(
+        Model.Ticket.Ticket_id == ticket_id, _TICKET_VISIBLE
+    ).first()
+    return (row.version, row.Date_modification) if row else None
+
+
 #STATISTIQUES GLOBALES
 
 def get_global_statistics(db: Session) -> dict:
     """Récupérer les statistiques globales"""
-    total_agents = db.query(Model.Agent).count()
-    total_tickets = db.query(Model.Ticket).count()
+    total_agents = db.query(Model.Agent).filter(_AGENT_ACTIF).count()
+    total_tickets = db.query(Model.Ticket).filter(_TICKET_VISIBLE).count()
     
     # Statistiques par statut
     stats_statut = {}
     for statut in Model.StatutEnum:
         # Compter les tickets avec ce statut comme dernier événement
-        count = db.query(Model.Event_ticket).filter(
-            Model.Event_ticket.statut == statut
+        count = db.query(Model.Event_ticket).join(
+            Model.Ticket, Model.Ticket.Ticket_id == Model.Event_ticket.Ticket_id
+        ).filter(
+            Model.Event_ticket.statut == statut, _TICKET_VISIBLE
         ).count()
         stats_statut[statut.value] = count
     
     # Statistiques par catégorie d'agent
     stats_categorie_agent = {}
     for categorie in Model.CategorieEnum:
-        count = db.query(Model.Agent).filter(Model.Agent.Categorie == categorie).count()
+        count = db.query(Model.Agent).filter(Model.Agent.Categorie == categorie, _AGENT_ACTIF).count()
         stats_categorie_agent[categorie.value] = count
     
     return {
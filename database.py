@@ -0,0 +1,179 @@
+from typing import List
+
+from sqlalchemy import MetaData, create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import Model
+from config import Settings
+
+
+def create_db_engine(settings: Settings) -> Engine:
+    """Créer le moteur SQLAlchemy (sans toucher au schéma)"""
+    connect_args = {}
+    if settings.database_url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    
+    # Taille et attente du pool : seulement pour un QueuePool (SQLite en mémoire
+    # utilise un SingletonThreadPool, qui refuse ces arguments)
+    pool_args = {}
+    url = make_url(settings.database_url)
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        pool_args = dict(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout
+        )
+    
+    engine = create_engine(
+        settings.database_url,
+        connect_args=connect_args,
+        **pool_args
+    )
+    
+    if settings.database_url.startswith("sqlite"):
+        # SQLite n'applique les clés étrangères (et ON DELETE CASCADE) que sur demande
+        @event.listens_for(engine, "connect")
+        def _enable_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    
+    return engine
+
+
+def create_session_factory(engine: Engine) -> sessionmaker:
+    """Créer la fabrique de sessions liée au moteur"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def upgrade_db(engine: Engine) -> List[str]:
+    """Mettre le schéma de la base au niveau du modèle (opération ponctuelle, voir migrate.py)
+
+    Crée les tables manquantes, puis reconstruit chaque table existante à
+    laquelle il manque des colonnes ou dont les clés étrangères (ON DELETE)
+    diffèrent du modèle. Renvoie la liste des opérations effectuées.
+    """
+    metadata = Model.Base.metadata
+    existantes = set(inspect(engine).get_table_names())
+    metadata.create_all(bind=engine)
+    operations = [f"table {name} créée" for name in metadata.tables if name not in existantes]
+
+    inspector = inspect(engine)
+    a_reconstruire = []
+    for table in metadata.sorted_tables:
+        if table.name not in existantes:
+            continue
+        colonnes = {colonne["name"] for colonne in inspector.get_columns(table.name)}
+        manquantes = [colonne.name for colonne in table.columns if colonne.name not in colonnes]
+        if manquantes or _cles_etrangeres(inspector, table) != _cles_etrangeres_modele(table):
+            a_reconstruire.append((table, colonnes))
+            detail = f" (colonnes ajoutées : {', '.join(manquantes)})" if manquantes else ""
+            operations.append(f"table {table.name} reconstruite{detail}")
+
+    if a_reconstruire:
+        if engine.dialect.name != "sqlite":
+            raise RuntimeError(
+                f"Mise à niveau automatique disponible pour SQLite uniquement : {operations}"
+            )
+        _rebuild_sqlite_tables(engine, a_reconstruire)
+    return operations
+
+
+def _cles_etrangeres(inspector, table) -> set:
+    """Clés étrangères d'une table existante : (colonnes, table cible, action ON DELETE)"""
+    return {
+        (
+            tuple(cle["constrained_columns"]),
+            cle["referred_table"],
+            (cle.get("options", {}).get("ondelete") or "NO ACTION").upper()
+        )
+        for cle in inspector.get_foreign_keys(table.name)
+    }
+
+
+def _cles_etrangeres_modele(table) -> set:
+    """Clés étrangères d'une table du modèle, au même format que _cles_etrangeres"""
+    return {
+        (
+            tuple(cle.column_keys),
+            cle.referred_table.name,
+            (cle.ondelete or "NO ACTION").upper()
+        )
+        for cle in table.foreign_key_constraints
+    }
+
+
+def _valeur_par_defaut(colonne, dialect):
+    """Valeur (au format du pilote) d'une colonne ajoutée, pour les lignes existantes"""
+    defaut = colonne.default if colonne.default is not None else colonne.insert_default
+    if defaut is None:
+        valeur = None
+    elif defaut.is_callable:
+        valeur = defaut.arg(None)
+    else:
+        valeur = defaut.arg
+    traitement = colonne.type.bind_processor(dialect)
+    return traitement(valeur) if traitement else valeur
+
+
+def _rebuild_sqlite_tables(engine: Engine, tables: list) -> None:
+    """Reconstruire des tables SQLite (ALTER TABLE ne modifie pas les clés étrangères).
+
+    Procédure recommandée par SQLite : clés étrangères désactivées, nouvelle
+    table créée puis remplie, ancienne table supprimée, renommage, recréation
+    des index, puis vérification des clés étrangères, le tout en une transaction.
+    """
+    dialect = engine.dialect
+    quote = dialect.identifier_preparer.quote
+    # Copie du modèle où créer les tables <nom>_new (leurs clés étrangères y sont résolues)
+    copie = MetaData()
+    for table in Model.Base.metadata.sorted_tables:
+        table.to_metadata(copie)
+
+    brute = engine.raw_connection()
+    try:
+        connexion = brute.driver_connection
+        # Transaction gérée explicitement : le pilote sqlite3 n'en ouvre pas pour le DDL
+        isolation = connexion.isolation_level
+        connexion.isolation_level = None
+        connexion.execute("PRAGMA foreign_keys=OFF")
+        try:
+            connexion.execute("BEGIN")
+            for table, colonnes in tables:
+                nouvelle = table.to_metadata(copie, name=f"{table.name}_new")
+                connexion.execute(str(CreateTable(nouvelle).compile(dialect=dialect)))
+
+                noms = [colonne.name for colonne in table.columns]
+                valeurs = [
+                    quote(colonne.name) if colonne.name in colonnes else "?"
+                    for colonne in table.columns
+                ]
+                parametres = [
+                    _valeur_par_defaut(colonne, dialect)
+                    for colonne in table.columns if colonne.name not in colonnes
+                ]
+                connexion.execute(
+                    f"INSERT INTO {quote(nouvelle.name)} ({', '.join(quote(nom) for nom in noms)}) "
+                    f"SELECT {', '.join(valeurs)} FROM {quote(table.name)}",
+                    parametres
+                )
+                connexion.execute(f"DROP TABLE {quote(table.name)}")
+                connexion.execute(f"ALTER TABLE {quote(nouvelle.name)} RENAME TO {quote(table.name)}")
+                for index in table.indexes:
+                    connexion.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)))
+
+            erreurs = connexion.execute("PRAGMA foreign_key_check").fetchall()
+            if erreurs:
+                raise RuntimeError(f"Clés étrangères invalides après reconstruction : {erreurs[:10]}")
+            connexion.execute("COMMIT")
+        except Exception:
+            connexion.execute("ROLLBACK")
+            raise
+        finally:
+            connexion.execute("PRAGMA foreign_keys=ON")
+            connexion.isolation_level = isolation
+    finally:
+        brute.close()
@@ -0,0 +1,444 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+import schemas, crud
+from config import Settings
+from database import create_db_engine, create_session_factory
+
+
+# Etat d'un job : <jobs_dir>/<job_id>/status.json, résultat à côté (result.json / result.csv).
+# Le disque sert d'état partagé : le worker API qui soumet le job, le processus qui
+# l'exécute et les autres workers API lisent et écrivent le même fichier.
+STATUS_FILE = "status.json"
+
+# Battement de cœur d'un job actif : <job_dir>/heartbeat, touché périodiquement par
+# le worker API qui l'a soumis (tant que son futur n'est pas terminé) et à chaque
+# progression par le processus qui l'exécute. Fichier séparé : le toucher ne
+# risque pas d'écraser une mise à jour concurrente de status.json.
+HEARTBEAT_FILE = "heartbeat"
+HEARTBEAT_INTERVAL = 10  # secondes
+
+_HOTE = socket.gethostname()
+
+# Verrou de soumission d'un couple (type, paramètres) : <jobs_dir>/.submit-<clé>.lock.
+# Un verrou plus vieux que VERROU_PERIME a été laissé par un processus tué
+# pendant la section critique (quelques millisecondes) et peut être forcé.
+VERROU_PERIME = 30  # secondes
+VERROU_DELAI = 5  # secondes
+
+# Intervalle (en lignes) entre deux mises à jour de la progression d'un export
+EXPORT_BATCH_SIZE = 1000
+
+# Statuts d'un job pas encore terminé (jamais purgé ; renvoyé par submit au lieu d'un doublon)
+_ACTIFS = (schemas.JobStatutEnum.en_attente.value, schemas.JobStatutEnum.en_cours.value)
+
+
+def _write_status(job_dir: Path, status: dict) -> None:
+    """Écrire l'état d'un job de façon atomique"""
+    tmp = job_dir / f".{STATUS_FILE}.{os.getpid()}"
+    tmp.write_text(json.dumps(status), encoding="utf-8")
+    os.replace(tmp, job_dir / STATUS_FILE)
+
+
+def _touch_heartbeat(job_dir: Path) -> None:
+    """Signaler qu'un job actif a toujours un processus propriétaire"""
+    try:
+        (job_dir / HEARTBEAT_FILE).touch()
+    except FileNotFoundError:
+        # Job purgé entre-temps
+        pass
+
+
+def _last_heartbeat(job_dir: Path) -> Optional[datetime]:
+    """Date du dernier battement (à défaut, de la dernière écriture de l'état)"""
+    for name in (HEARTBEAT_FILE, STATUS_FILE):
+        try:
+            return datetime.fromtimestamp((job_dir / name).stat().st_mtime)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _process_exists(pid: int) -> bool:
+    """Tester l'existence d'un processus de cette machine (POSIX)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _verrou(path: Path):
+    """Verrou inter-processus : fichier créé avec O_CREAT | O_EXCL, supprimé à la sortie"""
+    debut = time.monotonic()
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime > VERROU_PERIME:
+                    path.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() - debut > VERROU_DELAI:
+                raise TimeoutError(f"Verrou de soumission occupé : {path.name}")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _read_status(job_dir: Path) -> Optional[dict]:
+    """Lire l'état d'un job (None s'il n'existe pas)"""
+    try:
+        return json.loads((job_dir / STATUS_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class _Progress:
+    """Mise à jour de la progression d'un job depuis le processus d'exécution"""
+
+    def __init__(self, job_dir: Path, status: dict):
+        self.job_dir = job_dir
+        self.status = status
+
+    def update(self, done: int, total: int, message: Optional[str] = None) -> None:
+        self.status["progression"] = round(done / total, 4) if total else 1.0
+        if message:
+            self.status["message"] = message
+        _write_status(self.job_dir, self.status)
+        _touch_heartbeat(self.job_dir)
+
+
+# TACHES (exécutées dans les processus du pool)
+
+def _task_statistiques_globales(db: Session, job_dir: Path, progress: _Progress, parametres: dict) -> str:
+    """Recalcul des statistiques globales"""
+    stats = crud.get_global_statistics(db)
+    progress.update(1, 1)
+    result = job_dir / "result.json"
+    result.write_text(json.dumps(stats, ensure_ascii=False), encoding="utf-8")
+    return result.name
+
+
+def _task_statistiques_agents(db: Session, job_dir: Path, progress: _Progress, parametres: dict) -> str:
+    """Statistiques détaillées de tous les agents"""
+    agent_ids = crud.get_agent_ids(db)
+    stats = []
+    for done, agent_id in enumerate(agent_ids, start=1):
+        stats.append(crud.get_agent_statistics(db, agent_id))
+        if done % 50 == 0:
+            progress.update(done, len(agent_ids), f"{done}/{len(agent_ids)} agents")
+    progress.update(len(agent_ids), len(agent_ids), f"{len(agent_ids)} agents")
+
+    result = job_dir / "result.json"
+    result.write_text(json.dumps(stats, ensure_ascii=False), encoding="utf-8")
+    return result.name
+
+
+def _task_export_tickets(db: Session, job_dir: Path, progress: _Progress, parametres: dict) -> str:
+    """Export CSV de tous les tickets"""
+    fields = list(schemas.Ticket.model_fields)
+    total = crud.count_tickets(db)
+
+    result = job_dir / "result.csv"
+    with result.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        done = 0
+        for done, row in enumerate(crud.iter_tickets_rows(db, fields, EXPORT_BATCH_SIZE), start=1):
+            writer.writerow(row)
+            if done % EXPORT_BATCH_SIZE == 0:
+                progress.update(done, total, f"{done}/{total} tickets exportés")
+    progress.update(done, total, f"{done} tickets exportés")
+    return result.name
+
+
+def _task_purge_suppressions(db: Session, job_dir: Path, progress: _Progress, parametres: dict) -> str:
+    """Purge par lots des agents supprimés logiquement (parametres["agent_id"], ou tous)"""
+    purges = crud.purge_deleted_agents(
+        db,
+        agent_id=parametres.get("agent_id"),
+        batch_size=_settings.purge_batch_size,
+        on_progress=lambda done, total: progress.update(done, total, f"{done}/{total} tickets purgés")
+    )
+    result = job_dir / "result.json"
+    result.write_text(json.dumps({"tickets_purges": purges}), encoding="utf-8")
+    return result.name
+
+
+TASKS: Dict[schemas.JobTypeEnum, Callable[[Session, Path, _Progress, dict], str]] = {
+    schemas.JobTypeEnum.statistiques_globales: _task_statistiques_globales,
+    schemas.JobTypeEnum.statistiques_agents: _task_statistiques_agents,
+    schemas.JobTypeEnum.export_tickets: _task_export_tickets,
+    schemas.JobTypeEnum.purge_suppressions: _task_purge_suppressions,
+}
+
+
+# Paramètres et fabrique de sessions propres à chaque processus du pool
+_settings: Optional[Settings] = None
+_SessionLocal = None
+
+
+def _init_worker(settings: Settings) -> None:
+    """Initialiser le moteur de la base dans un processus du pool"""
+    global _settings, _SessionLocal
+    _settings = settings
+    _SessionLocal = create_session_factory(create_db_engine(settings))
+
+
+def _run_job(job_dir: str) -> None:
+    """Exécuter un job dans un processus du pool"""
+    job_dir = Path(job_dir)
+    status = _read_status(job_dir)
+    if status is None or status["statut"] != schemas.JobStatutEnum.en_attente.value:
+        # Job expiré, supprimé ou déclaré abandonné avant son exécution
+        return
+
+    status.update(statut=schemas.JobStatutEnum.en_cours.value, debut=datetime.now().isoformat())
+    _write_status(job_dir, status)
+    _touch_heartbeat(job_dir)
+    progress = _Progress(job_dir, status)
+
+    db = _SessionLocal()
+    try:
+        status["resultat"] = TASKS[schemas.JobTypeEnum(status["type"])](
+            db, job_dir, progress, status.get("parametres") or {}
+        )
+        status.update(statut=schemas.JobStatutEnum.termine.value, progression=1.0)
+    except Exception as e:
+        status.update(statut=schemas.JobStatutEnum.erreur.value, erreur=str(e))
+    finally:
+        db.close()
+
+    # La durée de conservation court à partir de la fin du job
+    fin = datetime.now()
+    ttl = datetime.fromisoformat(status["expiration"]) - datetime.fromisoformat(status["creation"])
+    status.update(fin=fin.isoformat(), expiration=(fin + ttl).isoformat())
+    _write_status(job_dir, status)
+
+
+class JobManager:
+    """Soumission et suivi des jobs lourds (statistiques, exports) hors des requêtes"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.jobs_dir = Path(settings.jobs_dir)
+        self.ttl = timedelta(seconds=settings.jobs_ttl)
+        self.heartbeat_timeout = timedelta(seconds=settings.jobs_heartbeat_timeout)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Jobs soumis par ce worker dont le futur n'est pas terminé (battement de cœur)
+        self._soumis: Set[Path] = set()
+        self._soumis_lock = threading.Lock()
+        self._arret = threading.Event()
+
+    def start(self) -> None:
+        """Démarrer le pool de processus (max_workers = limite de concurrence)"""
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.purge_expired()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.settings.jobs_max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.settings,)
+        )
+        self._arret.clear()
+        threading.Thread(target=self._heartbeat_loop, name="jobs-heartbeat", daemon=True).start()
+
+    def shutdown(self) -> None:
+        """Arrêter le pool sans attendre les jobs en cours"""
+        self._arret.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, job_type: schemas.JobTypeEnum, parametres: Optional[dict] = None) -> dict:
+        """Créer un job et le placer dans la file du pool.
+
+        Un job identique (même type, mêmes paramètres) encore en attente ou en
+        cours est renvoyé au lieu d'en créer un second qui ferait le même travail.
+        """
+        self.purge_expired()
+        parametres = parametres or {}
+        cle = hashlib.sha1(
+            json.dumps([job_type.value, parametres], sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+
+        # Recherche et création sous verrou : deux soumissions concurrentes (même
+        # depuis deux workers) ne peuvent pas créer chacune leur job
+        with _verrou(self.jobs_dir / f".submit-{cle}.lock"):
+            actif = self._find_active(job_type, parametres)
+            if actif is not None:
+                return actif
+
+            job_id = uuid.uuid4().hex
+            job_dir = self.jobs_dir / job_id
+            job_dir.mkdir()
+            maintenant = datetime.now()
+            status = {
+                "job_id": job_id,
+                "type": job_type.value,
+                "parametres": parametres,
+                # Worker API propriétaire (sa disparition signale un job abandonné)
+                "hote": _HOTE,
+                "pid": os.getpid(),
+                "statut": schemas.JobStatutEnum.en_attente.value,
+                "progression": 0.0,
+                "message": None,
+                "erreur": None,
+                "resultat": None,
+                "creation": maintenant.isoformat(),
+                "debut": None,
+                "fin": None,
+                "expiration": (maintenant + self.ttl).isoformat()
+            }
+            _write_status(job_dir, status)
+            _touch_heartbeat(job_dir)
+            with self._soumis_lock:
+                self._soumis.add(job_dir)
+
+        future = self._executor.submit(_run_job, str(job_dir))
+        future.add_done_callback(lambda f: self._on_done(job_dir, f))
+        return status
+
+    def _find_active(self, job_type: schemas.JobTypeEnum, parametres: dict) -> Optional[dict]:
+        """Job en attente ou en cours de même type et de mêmes paramètres"""
+        for job_dir in self.jobs_dir.iterdir():
+            status = _read_status(job_dir) if job_dir.is_dir() else None
+            if status is not None and self._abandon_if_orphaned(job_dir, status):
+                continue
+            if (
+                status is not None
+                and status["statut"] in _ACTIFS
+                and status["type"] == job_type.value
+                and status.get("parametres", {}) == parametres
+            ):
+                return status
+        return None
+
+    def _heartbeat_loop(self) -> None:
+        """Toucher le battement de cœur des jobs soumis par ce worker"""
+        while not self._arret.wait(HEARTBEAT_INTERVAL):
+            with self._soumis_lock:
+                soumis = list(self._soumis)
+            for job_dir in soumis:
+                _touch_heartbeat(job_dir)
+
+    def _abandon_if_orphaned(self, job_dir: Path, status: dict) -> bool:
+        """Passer en erreur un job actif dont le processus propriétaire a disparu"""
+        if status["statut"] not in _ACTIFS:
+            return False
+        # Même machine : le worker propriétaire existe-t-il encore ? (os.kill(pid, 0)
+        # terminerait le processus sous Windows : seul le battement y est vérifié)
+        proprietaire_mort = (
+            os.name == "posix"
+            and status.get("hote") == _HOTE
+            and status.get("pid") is not None
+            and not _process_exists(status["pid"])
+        )
+        dernier = _last_heartbeat(job_dir)
+        silencieux = dernier is not None and datetime.now() - dernier > self.heartbeat_timeout
+        if not (proprietaire_mort or silencieux):
+            return False
+
+        fin = datetime.now()
+        status.update(
+            statut=schemas.JobStatutEnum.erreur.value,
+            erreur="Job abandonné : son processus s'est arrêté avant la fin",
+            fin=fin.isoformat(),
+            expiration=(fin + self.ttl).isoformat()
+        )
+        _write_status(job_dir, status)
+        return True
+
+    def _on_done(self, job_dir: Path, future: Future) -> None:
+        """Marquer en erreur un job dont le processus a échoué (pool cassé, annulation)"""
+        with self._soumis_lock:
+            self._soumis.discard(job_dir)
+        if future.cancelled():
+            erreur = "Job annulé"
+        elif future.exception() is not None:
+            erreur = str(future.exception()) or type(future.exception()).__name__
+        else:
+            return
+
+        status = _read_status(job_dir)
+        if status and status["statut"] not in (
+            schemas.JobStatutEnum.termine.value, schemas.JobStatutEnum.erreur.value
+        ):
+            status.update(statut=schemas.JobStatutEnum.erreur.value, erreur=erreur)
+            _write_status(job_dir, status)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Récupérer l'état d'un job (None s'il est inconnu ou expiré)"""
+        # L'identifiant sert de nom de dossier : refuser tout ce qui n'est pas un uuid hex
+        if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        job_dir = self.jobs_dir / job_id
+        status = _read_status(job_dir)
+        if status is None:
+            return None
+        self._abandon_if_orphaned(job_dir, status)
+        if self._is_expired(status):
+            return None
+        return status
+
+    def result_path(self, status: dict) -> Optional[Path]:
+        """Chemin du fichier résultat d'un job terminé"""
+        if status["statut"] != schemas.JobStatutEnum.termine.value or not status["resultat"]:
+            return None
+        return self.jobs_dir / status["job_id"] / status["resultat"]
+
+    def purge_expired(self) -> int:
+        """Supprimer du disque les jobs expirés"""
+        purges = 0
+        for job_dir in self.jobs_dir.iterdir():
+            if not job_dir.is_dir():
+                continue
+            status = _read_status(job_dir)
+            # Un dossier sans état (job en cours de création) n'est supprimé qu'après le TTL
+            if status is None:
+                try:
+                    age = datetime.now() - datetime.fromtimestamp(job_dir.stat().st_mtime)
+                except FileNotFoundError:
+                    # Déjà supprimé par un autre worker
+                    continue
+                expired = age > self.ttl
+            else:
+                self._abandon_if_orphaned(job_dir, status)
+                expired = self._is_expired(status)
+            if expired:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                purges += 1
+        return purges
+
+    def _is_expired(self, status: dict) -> bool:
+        # Un job en attente ou en cours n'expire pas : son expiration est recalculée à la fin
+        if status["statut"] in _ACTIFS:
+            return False
+        return datetime.fromisoformat(status["expiration"]) < datetime.now()
@@ -1,52 +1,168 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+import time
+
+# Début du démarrage à froid du worker (imports compris)
+_IMPORT_START = time.perf_counter()
+
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from typing import List, Optional
-from datetime import date
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import logging
+import os
 
 import Model, schemas, crud
+from config import Settings
+from database import create_db_engine, create_session_factory
+from jobs import JobManager
+from admission import AdmissionLimiter, write_admission
+from snapshot import EventSnapshot
 
-# Configuration de la base de données
-SQLALCHEMY_DATABASE_URL = "sqlite:///./agence_tickets.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Journal du serveur uvicorn (affiché avec les logs de démarrage des workers)
+logger = logging.getLogger("uvicorn.error")
 
-# Créer les tables
-Model.Base.metadata.create_all(bind=engine)
+router = APIRouter()
 
-# Initialisation de l'application FastAPI
-app = FastAPI(
-    title="API Gestion Agence Tickets",
-    description="API pour gérer les agents, tickets et événements d'une agence",
-    version="1.0.0"
-)
 
-# Configuration CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # En production, spécifier les domaines autorisés
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Construire l'application FastAPI (sans effet de bord avant le démarrage)"""
+    settings = settings or Settings.from_env()
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Le schéma n'est pas créé ici : voir migrate.py
+        engine = create_db_engine(settings)
+        app.state.engine = engine
+        app.state.SessionLocal = create_session_factory(engine)
+        app.state.jobs = JobManager(settings)
+        app.state.jobs.start()
+        app.state.event_snapshot = EventSnapshot()
+        # Créé ici : le sémaphore se lie à la boucle d'événements qui sert l'application
+        app.state.admission = AdmissionLimiter(
+            max_concurrent=settings.write_max_concurrent,
+            max_queue=settings.write_max_queue,
+            queue_timeout=settings.write_queue_timeout,
+            retry_after=settings.write_retry_after
+        )
+        app.state.startup_ms = round((time.perf_counter() - _IMPORT_START) * 1000, 1)
+        logger.info("Worker %s prêt en %.1f ms", os.getpid(), app.state.startup_ms)
+        try:
+            yield
+        finally:
+            app.state.jobs.shutdown()
+            engine.dispose()
+    
+    # Initialisation de l'application FastAPI
+    app = FastAPI(
+        title="API Gestion Agence Tickets",
+        description="API pour gérer les agents, tickets et événements d'une agence",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    app.state.settings = settings
+    
+    # Configuration CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # En production, spécifier les domaines autorisés
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Compression des réponses volumineuses (listes de plusieurs centaines de lignes)
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    
+    app.include_router(router)
+    app.add_exception_handler(ValueError, value_error_handler)
+    app.add_exception_handler(Exception, general_exception_handler)
+    return app
+
 
 # Dépendance pour obtenir la session de base de données
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = request.app.state.SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
+class JSONBytesResponse(Response):
+    """Réponse JSON dont le contenu est déjà sérialisé (bytes)"""
+    media_type = "application/json"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Découper le paramètre ?fields= en liste de noms de champs"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+# Nombre maximal d'IDs acceptés par un endpoint batch
+MAX_BATCH_IDS = 1000
+
+# Nombre maximal d'instants par appel à /statistics/as-of
+MAX_AS_OF_INSTANTS = 1000
+
+
+def parse_ids(ids: str) -> List[int]:
+    """Découper le paramètre ?ids= (IDs séparés par des virgules, sans doublons)"""
+    try:
+        parsed = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Le paramètre ids doit contenir des entiers séparés par des virgules")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="Le paramètre ids est vide")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Au plus {MAX_BATCH_IDS} IDs par requête")
+    return parsed
+
+
+def conditional_get(
+    request: Request,
+    tag: str,
+    version: int,
+    modifie_le: Optional[datetime]
+) -> Tuple[dict, bool]:
+    """Construire les en-têtes ETag/Last-Modified et indiquer si le client est à jour"""
+    # La date de modification (à la microseconde) distingue deux entités successives
+    # de même ID et de même version (ID réutilisé par SQLite après une suppression)
+    horodatage = modifie_le.strftime("%Y%m%d%H%M%S%f") if modifie_le else "0"
+    etag = f'W/"{tag}-{version}-{horodatage}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modifie_le:
+        headers["Last-Modified"] = format_datetime(modifie_le.astimezone(timezone.utc), usegmt=True)
+    
+    # If-None-Match est prioritaire sur If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+        return headers, "*" in etags or etag.removeprefix("W/") in etags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modifie_le:
+        try:
+            depuis = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return headers, False
+        return headers, modifie_le.astimezone(timezone.utc).replace(microsecond=0) <= depuis
+    return headers, False
+
+
 # ============ ENDPOINTS AGENTS ============
 
-@app.post("/agents/", response_model=schemas.Agent, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/agents/",
+    response_model=schemas.Agent,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(write_admission)]
+)
 def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db)):
     """Créer un nouvel agent"""
     # Vérifier si l'email existe déjà
@@ -59,35 +175,71 @@ def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db)):
     return crud.create_agent(db=db, agent=agent)
 
 
-@app.get("/agents/", response_model=List[schemas.Agent])
+@router.get("/agents/", response_model=List[schemas.Agent])
 def read_agents(
+    request: Request,
     skip: int = Query(0, ge=0, description="Nombre d'éléments à ignorer"),
     limit: int = Query(100, ge=1, le=1000, description="Nombre maximum d'éléments à retourner"),
     categorie: Optional[str] = Query(None, description="Filtrer par catégorie (transaction/conseil)"),
     search: Optional[str] = Query(None, description="Rechercher dans nom, prénoms ou email"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
     db: Session = Depends(get_db)
 ):
     """Récupérer la liste des agents avec filtres optionnels"""
-    agents = crud.get_agents(
-        db, 
-        skip=skip, 
-        limit=limit, 
-        categorie=categorie, 
-        search=search
+    headers, not_modified = conditional_get(
+        request, "agents", *crud.get_collection_version(db, "agent")
     )
-    return agents
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        agents = crud.get_agents_rows(
+            db, 
+            skip=skip, 
+            limit=limit, 
+            categorie=categorie, 
+            search=search,
+            fields=parse_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONBytesResponse(schemas.AgentRows.dump_json(agents), headers=headers)
 
 
-@app.get("/agents/{agent_id}", response_model=schemas.Agent)
-def read_agent(agent_id: int, db: Session = Depends(get_db)):
+@router.get("/agents/batch", response_model=Dict[int, Optional[schemas.Agent]])
+def read_agents_batch(
+    ids: str = Query(..., description="IDs des agents, séparés par des virgules"),
+    db: Session = Depends(get_db)
+):
+    """Récupérer plusieurs agents en une requête, indexés par ID"""
+    agents = crud.get_agents_by_ids(db, parse_ids(ids))
+    return JSONBytesResponse(schemas.AgentsById.dump_json(agents))
+
+
+@router.get("/agents/{agent_id}", response_model=schemas.Agent)
+def read_agent(
+    agent_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """Récupérer un agent par son ID"""
+    version = crud.get_agent_version(db, agent_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Agent non trouvé")
+    
+    headers, not_modified = conditional_get(request, f"agent-{agent_id}", *version)
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
     db_agent = crud.get_agent(db, agent_id=agent_id)
     if db_agent is None:
         raise HTTPException(status_code=404, detail="Agent non trouvé")
+    response.headers.update(headers)
     return db_agent
 
 
-@app.put("/agents/{agent_id}", response_model=schemas.Agent)
+@router.put("/agents/{agent_id}", response_model=schemas.Agent, dependencies=[Depends(write_admission)])
 def update_agent(
     agent_id: int, 
     agent_update: schemas.AgentUpdate, 
@@ -100,33 +252,72 @@ def update_agent(
     return db_agent
 
 
-@app.delete("/agents/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_agent(agent_id: int, db: Session = Depends(get_db)):
-    """Supprimer un agent"""
+@router.delete(
+    "/agents/{agent_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={202: {"model": schemas.Job, "description": "Suppression logique, purge en arrière-plan"}},
+    dependencies=[Depends(write_admission)]
+)
+def delete_agent(agent_id: int, request: Request, db: Session = Depends(get_db)):
+    """Supprimer un agent (purge en arrière-plan au-delà de PURGE_THRESHOLD tickets)"""
+    if not crud.agent_exists(db, agent_id):
+        raise HTTPException(status_code=404, detail="Agent non trouvé")
+    
+    # Les événements enregistrés sur les tickets d'autres agents font partie de leur historique
+    evenements = crud.count_agent_foreign_events(db, agent_id)
+    if evenements:
+        raise HTTPException(
+            status_code=409,
+            detail=f"L'agent a enregistré {evenements} événement(s) sur les tickets d'autres agents"
+        )
+    
+    if crud.count_agent_tickets(db, agent_id) > request.app.state.settings.purge_threshold:
+        if not crud.soft_delete_agent(db, agent_id=agent_id):
+            raise HTTPException(status_code=404, detail="Agent non trouvé")
+        job = request.app.state.jobs.submit(
+            schemas.JobTypeEnum.purge_suppressions, {"agent_id": agent_id}
+        )
+        return JSONBytesResponse(
+            schemas.Job.model_validate(job).model_dump_json(),
+            status_code=status.HTTP_202_ACCEPTED
+        )
+    
     success = crud.delete_agent(db, agent_id=agent_id)
     if not success:
         raise HTTPException(status_code=404, detail="Agent non trouvé")
     return None
 
 
-@app.get("/agents/{agent_id}/tickets", response_model=List[schemas.Ticket])
+@router.get("/agents/{agent_id}/tickets", response_model=List[schemas.Ticket])
 def read_agent_tickets(
     agent_id: int, 
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
     db: Session = Depends(get_db)
 ):
     """Récupérer tous les tickets d'un agent"""
     # Vérifier que l'agent existe
-    agent = crud.get_agent(db, agent_id)
-    if not agent:
+    if not crud.agent_exists(db, agent_id):
         raise HTTPException(status_code=404, detail="Agent non trouvé")
     
-    tickets = crud.get_tickets(db, skip=skip, limit=limit, agent_id=agent_id)
-    return tickets
+    headers, not_modified = conditional_get(
+        request, f"agent-{agent_id}-tickets", *crud.get_collection_version(db, "ticket")
+    )
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        tickets = crud.get_tickets_rows(
+            db, skip=skip, limit=limit, agent_id=agent_id, fields=parse_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONBytesResponse(schemas.TicketRows.dump_json(tickets), headers=headers)
 
 
-@app.get("/agents/{agent_id}/statistics")
+@router.get("/agents/{agent_id}/statistics")
 def read_agent_statistics(agent_id: int, db: Session = Depends(get_db)):
     """Récupérer les statistiques d'un agent"""
     stats = crud.get_agent_statistics(db, agent_id)
@@ -137,7 +328,12 @@ def read_agent_statistics(agent_id: int, db: Session = Depends(get_db)):
 
 # ============ ENDPOINTS TICKETS ============
 
-@app.post("/tickets/", response_model=schemas.Ticket, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/tickets/",
+    response_model=schemas.Ticket,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(write_admission)]
+)
 def create_ticket(ticket: schemas.TicketCreate, db: Session = Depends(get_db)):
     """Créer un nouveau ticket"""
     try:
@@ -146,8 +342,9 @@ def create_ticket(ticket: schemas.TicketCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/tickets/", response_model=List[schemas.Ticket])
+@router.get("/tickets/", response_model=List[schemas.Ticket])
 def read_tickets(
+    request: Request,
     skip: int = Query(0, ge=0, description="Nombre d'éléments à ignorer"),
     limit: int = Query(100, ge=1, le=1000, description="Nombre maximum d'éléments à retourner"),
     categorie: Optional[str] = Query(None, description="Filtrer par catégorie de service"),
@@ -155,45 +352,93 @@ def read_tickets(
     date_debut: Optional[date] = Query(None, description="Date de début (YYYY-MM-DD)"),
     date_fin: Optional[date] = Query(None, description="Date de fin (YYYY-MM-DD)"),
     statut: Optional[str] = Query(None, description="Filtrer par statut"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
     db: Session = Depends(get_db)
 ):
     """Récupérer la liste des tickets avec filtres optionnels"""
-    tickets = crud.get_tickets(
-        db, 
-        skip=skip, 
-        limit=limit,
-        categorie=categorie,
-        agent_id=agent_id,
-        date_debut=date_debut,
-        date_fin=date_fin,
-        statut=statut
+    headers, not_modified = conditional_get(
+        request, "tickets", *crud.get_collection_version(db, "ticket")
     )
-    return tickets
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    try:
+        tickets = crud.get_tickets_rows(
+            db, 
+            skip=skip, 
+            limit=limit,
+            categorie=categorie,
+            agent_id=agent_id,
+            date_debut=date_debut,
+            date_fin=date_fin,
+            statut=statut,
+            fields=parse_fields(fields)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONBytesResponse(schemas.TicketRows.dump_json(tickets), headers=headers)
+
+
+@router.get("/tickets/batch", response_model=Dict[int, Optional[schemas.Ticket]])
+def read_tickets_batch(
+    ids: str = Query(..., description="IDs des tickets, séparés par des virgules"),
+    db: Session = Depends(get_db)
+):
+    """Récupérer plusieurs tickets en une requête, indexés par ID"""
+    tickets = crud.get_tickets_by_ids(db, parse_ids(ids))
+    return JSONBytesResponse(schemas.TicketsById.dump_json(tickets))
 
 
-@app.get("/tickets/{ticket_id}", response_model=schemas.Ticket)
-def read_ticket(ticket_id: int, db: Session = Depends(get_db)):
+@router.get("/tickets/status/batch")
+def read_tickets_status_batch(
+    ids: str = Query(..., description="IDs des tickets, séparés par des virgules"),
+    db: Session = Depends(get_db)
+):
+    """Récupérer le statut actuel de plusieurs tickets en une requête, indexé par ID"""
+    statuts = crud.get_tickets_current_status(db, parse_ids(ids))
+    return JSONBytesResponse(schemas.TicketStatutsById.dump_json(statuts))
+
+
+@router.get("/tickets/{ticket_id}", response_model=schemas.Ticket)
+def read_ticket(
+    ticket_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
     """Récupérer un ticket par son ID"""
+    version = crud.get_ticket_version(db, ticket_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Ticket non trouvé")
+    
+    headers, not_modified = conditional_get(request, f"ticket-{ticket_id}", *version)
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
     db_ticket = crud.get_ticket(db, ticket_id=ticket_id)
     if db_ticket is None:
         raise HTTPException(status_code=404, detail="Ticket non trouvé")
+    response.headers.update(headers)
     return db_ticket
 
 
-@app.put("/tickets/{ticket_id}", response_model=schemas.Ticket)
+@router.put("/tickets/{ticket_id}", response_model=schemas.Ticket, dependencies=[Depends(write_admission)])
 def update_ticket(
     ticket_id: int, 
     ticket_update: schemas.TicketUpdate, 
     db: Session = Depends(get_db)
 ):
     """Mettre à jour les détails d'un ticket"""
-    db_ticket = crud.update_ticket(db, ticket_id=ticket_id, ticket_update=ticket_update)
+    try:
+        db_ticket = crud.update_ticket(db, ticket_id=ticket_id, ticket_update=ticket_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if db_ticket is None:
         raise HTTPException(status_code=404, detail="Ticket non trouvé")
     return db_ticket
 
 
-@app.delete("/tickets/{ticket_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/tickets/{ticket_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(write_admission)])
 def delete_ticket(ticket_id: int, db: Session = Depends(get_db)):
     """Supprimer un ticket"""
     success = crud.delete_ticket(db, ticket_id=ticket_id)
@@ -202,7 +447,12 @@ def delete_ticket(ticket_id: int, db: Session = Depends(get_db)):
     return None
 
 
-@app.post("/tickets/{ticket_id}/status", response_model=schemas.EventTicket, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/tickets/{ticket_id}/status",
+    response_model=schemas.EventTicket,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(write_admission)]
+)
 def update_ticket_status(
     ticket_id: int,
     status_update: schemas.EventTicketCreate,
@@ -222,7 +472,7 @@ def update_ticket_status(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/tickets/{ticket_id}/status")
+@router.get("/tickets/{ticket_id}/status")
 def read_ticket_current_status(ticket_id: int, db: Session = Depends(get_db)):
     """Récupérer le statut actuel d'un ticket"""
     # Vérifier que le ticket existe
@@ -238,7 +488,7 @@ def read_ticket_current_status(ticket_id: int, db: Session = Depends(get_db)):
     }
 
 
-@app.get("/tickets/{ticket_id}/events", response_model=List[schemas.EventTicket])
+@router.get("/tickets/{ticket_id}/events", response_model=List[schemas.EventTicket])
 def read_ticket_events(ticket_id: int, db: Session = Depends(get_db)):
     """Récupérer l'historique des événements d'un ticket"""
     # Vérifier que le ticket existe
@@ -252,21 +502,96 @@ def read_ticket_events(ticket_id: int, db: Session = Depends(get_db)):
 
 # ============ ENDPOINTS STATISTIQUES ============
 
-@app.get("/statistics/global")
+@router.get("/statistics/global")
 def read_global_statistics(db: Session = Depends(get_db)):
     """Récupérer les statistiques globales de l'agence"""
     return crud.get_global_statistics(db)
 
 
+@router.get("/statistics/as-of")
+def read_backlog_as_of(
+    request: Request,
+    at: List[datetime] = Query(..., description="Instants (ISO 8601), paramètre répétable"),
+    statut: List[schemas.StatutEnum] = Query(
+        [schemas.StatutEnum.en_attente, schemas.StatutEnum.en_cours],
+        description="Statuts à compter, paramètre répétable"
+    ),
+    db: Session = Depends(get_db)
+):
+    """Nombre de tickets par agent et par statut à chacun des instants demandés"""
+    if len(at) > MAX_AS_OF_INSTANTS:
+        raise HTTPException(status_code=400, detail=f"Au plus {MAX_AS_OF_INSTANTS} instants par requête")
+    
+    # Les dates en base sont en heure locale naïve
+    instants = [t.astimezone().replace(tzinfo=None) if t.tzinfo else t for t in at]
+    statuts = [Model.StatutEnum(s.value) for s in statut]
+    return {
+        "statuts": [s.value for s in statuts],
+        "resultats": request.app.state.event_snapshot.backlog_as_of(db, instants, statuts)
+    }
+
+
+# ============ ENDPOINTS JOBS ============
+
+@router.post("/jobs", response_model=schemas.Job, status_code=status.HTTP_202_ACCEPTED)
+def create_job(job: schemas.JobCreate, request: Request):
+    """Lancer un calcul lourd (statistiques, export) en arrière-plan"""
+    return request.app.state.jobs.submit(job.type)
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.Job)
+def read_job(job_id: str, request: Request):
+    """Récupérer l'état et la progression d'un job"""
+    job = request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trouvé ou expiré")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+def read_job_result(job_id: str, request: Request):
+    """Télécharger le résultat d'un job terminé"""
+    jobs = request.app.state.jobs
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trouvé ou expiré")
+    
+    path = jobs.result_path(job)
+    if path is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Résultat indisponible (statut : {job['statut']})"
+        )
+    media_type = "text/csv" if path.suffix == ".csv" else "application/json"
+    return FileResponse(path, media_type=media_type, filename=f"{job['type']}_{job_id}{path.suffix}")
+
+
 # ============ ENDPOINTS UTILITAIRES ============
 
-@app.get("/health")
-def health_check():
+@router.get("/health")
+def health_check(request: Request):
     """Vérification de l'état de l'API"""
-    return {"status": "healthy", "message": "API Gestion Agence Tickets opérationnelle"}
+    return {
+        "status": "healthy",
+        "message": "API Gestion Agence Tickets opérationnelle",
+        "worker_pid": os.getpid(),
+        "demarrage_ms": getattr(request.app.state, "startup_ms", None)
+    }
 
 
-@app.get("/")
+@router.get("/metrics/cache")
+def read_cache_metrics():
+    """Compteurs du cache des agents (succès, échecs, invalidations)"""
+    return crud.get_agent_cache_stats()
+
+
+@router.get("/metrics/admission")
+def read_admission_metrics(request: Request):
+    """File d'attente et rejets du contrôle d'admission des écritures"""
+    return request.app.state.admission.stats()
+
+
+@router.get("/")
 def root():
     """Point d'entrée racine de l'API"""
     return {
@@ -278,13 +603,11 @@ def root():
 
 # ============ GESTION DES ERREURS GLOBALES ============
 
-@app.exception_handler(ValueError)
 async def value_error_handler(request, exc):
     """Gestionnaire d'erreur pour ValueError"""
     return HTTPException(status_code=400, detail=str(exc))
 
 
-@app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Gestionnaire d'erreur général"""
     return HTTPException(
@@ -293,6 +616,9 @@ async def general_exception_handler(request, exc):
     )
 
 
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
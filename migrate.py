@@ -0,0 +1,26 @@
+"""Mise en place et mise à niveau du schéma de la base.
+
+Crée les tables manquantes et met à niveau une base existante (colonnes
+ajoutées, clés étrangères ON DELETE CASCADE). À lancer avant de démarrer les
+workers de l'API, après chaque mise à jour du modèle :
+
+    python migrate.py
+"""
+from config import Settings
+from database import create_db_engine, upgrade_db
+
+
+def main() -> None:
+    settings = Settings.from_env()
+    engine = create_db_engine(settings)
+    try:
+        operations = upgrade_db(engine)
+    finally:
+        engine.dispose()
+    for operation in operations:
+        print(f"- {operation}")
+    print(f"Schéma à jour : {settings.database_url}")
+
+
+if __name__ == "__main__":
+    main()
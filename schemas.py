@@ -1,8 +1,11 @@
-from pydantic import BaseModel, Field, EmailStr, field_validator
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter, field_validator
+from typing import Any, Dict, List, Optional
+from typing_extensions import TypedDict
 from datetime import datetime
 from enum import Enum
 
+import Model
+
 
 
 class StatutEnum(str, Enum):
@@ -123,10 +126,79 @@ class EventTicket(EventTicketBase):
 
 
 
+# Schemas pour les jobs (statistiques lourdes, exports)
+class JobTypeEnum(str, Enum):
+    statistiques_globales = "statistiques_globales"
+    statistiques_agents = "statistiques_agents"
+    export_tickets = "export_tickets"
+    purge_suppressions = "purge_suppressions"
+
+
+class JobStatutEnum(str, Enum):
+    en_attente = "en_attente"
+    en_cours = "en_cours"
+    termine = "termine"
+    erreur = "erreur"
+
+
+class JobCreate(BaseModel):
+    type: JobTypeEnum
+
+
+class Job(BaseModel):
+    job_id: str
+    type: JobTypeEnum
+    parametres: Dict[str, Any] = {}
+    statut: JobStatutEnum
+    progression: float = Field(..., ge=0, le=1)
+    message: Optional[str] = None
+    erreur: Optional[str] = None
+    creation: datetime
+    debut: Optional[datetime] = None
+    fin: Optional[datetime] = None
+    expiration: datetime
+
+
+
 class AgentWithTickets(Agent):
     tickets: List[Ticket] = []
 
 
 class TicketWithEvents(Ticket):
     event_tickets: List[EventTicket] = []
-    agent: Optional[Agent] = None
\ No newline at end of file
+    agent: Optional[Agent] = None
+
+
+# Lignes brutes (chemin de lecture allégé) : sérialisées sans validation,
+# les clés absentes correspondent aux champs non demandés via ?fields=
+class AgentRow(TypedDict, total=False):
+    agent_id: int
+    Nom: str
+    Prenoms: str
+    Annee_Naissance: int
+    Categorie: Model.CategorieEnum
+    Email: str
+    Telephone: str
+    Enregistrement_date: datetime
+
+
+class TicketRow(TypedDict, total=False):
+    Ticket_id: int
+    Categorie_service: str
+    Description: str
+    Agent_id: int
+    Date_: datetime
+
+
+class TicketStatutRow(TypedDict):
+    ticket_id: int
+    statut_actuel: Optional[Model.StatutEnum]
+
+
+AgentRows = TypeAdapter(List[AgentRow])
+TicketRows = TypeAdapter(List[TicketRow])
+
+# Réponses des endpoints batch, indexées par ID (null si l'ID n'existe pas)
+AgentsById = TypeAdapter(Dict[int, Optional[AgentRow]])
+TicketsById = TypeAdapter(Dict[int, Optional[TicketRow]])
+TicketStatutsById = TypeAdapter(Dict[int, Optional[TicketStatutRow]])
\ No newline at end of file
@@ -0,0 +1,247 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import Model, crud
+
+
+# Codes numériques des statuts dans les tableaux (ordre de l'énumération)
+STATUTS = list(Model.StatutEnum)
+_STATUT_CODES = {statut: code for code, statut in enumerate(STATUTS)}
+
+# Fin d'intervalle du dernier événement d'un ticket (toujours en cours)
+_FIN_OUVERTE = np.iinfo(np.int64).max
+
+_VIDE = np.empty(0, dtype=np.int64)
+
+
+def _to_us(instants: List[datetime]) -> np.ndarray:
+    """Convertir des datetimes (heure locale naïve, comme en base) en microsecondes int64"""
+    return np.array(instants, dtype="datetime64[us]").astype(np.int64)
+
+
+def _intervalles(
+    tickets: np.ndarray,
+    agents: np.ndarray,
+    dates: np.ndarray,
+    statuts: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Intervalles [debut, fin) des événements : (clé agent/statut, debuts, fins)"""
+    ordre = np.lexsort((dates, tickets))
+    tickets, dates = tickets[ordre], dates[ordre]
+
+    # Un statut reste valable jusqu'à l'événement suivant du même ticket
+    fins = np.full(len(dates), _FIN_OUVERTE, dtype=np.int64)
+    meme_ticket = tickets[1:] == tickets[:-1]
+    fins[:-1][meme_ticket] = dates[1:][meme_ticket]
+    return agents[ordre] * len(STATUTS) + statuts[ordre], dates, fins
+
+
+def _grouper(cles: np.ndarray, debuts: np.ndarray, fins: np.ndarray) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """Regrouper des intervalles par clé, debuts et fins triés séparément dans chaque groupe"""
+    ordre_debuts = np.lexsort((debuts, cles))
+    ordre_fins = np.lexsort((fins, cles))
+    groupes, premiers = np.unique(cles[ordre_debuts], return_index=True)
+    bornes = np.append(premiers, len(cles)).tolist()
+    debuts, fins = debuts[ordre_debuts], fins[ordre_fins]
+    return {
+        cle: (debuts[debut:fin], fins[debut:fin])
+        for cle, debut, fin in zip(groupes.tolist(), bornes[:-1], bornes[1:])
+    }
+
+
+def _retirer(trie: np.ndarray, valeurs: np.ndarray) -> np.ndarray:
+    """Retirer d'un tableau trié des valeurs triées qu'il contient (doublons compris)"""
+    # Rang de chaque valeur parmi ses doublons : la k-ième copie retire la k-ième occurrence
+    rangs = np.arange(len(valeurs)) - np.searchsorted(valeurs, valeurs, side="left")
+    return np.delete(trie, np.searchsorted(trie, valeurs, side="left") + rangs)
+
+
+def _inserer(trie: np.ndarray, valeurs: np.ndarray) -> np.ndarray:
+    """Insérer des valeurs triées dans un tableau trié"""
+    return np.insert(trie, np.searchsorted(trie, valeurs), valeurs)
+
+
+@dataclass(frozen=True)
+class _Colonnes:
+    """Journal des événements en colonnes (ordre de lecture) et intervalles de statut groupés"""
+    tickets: np.ndarray
+    agents: np.ndarray
+    dates: np.ndarray
+    statuts: np.ndarray
+    versions: Tuple[int, int]
+    # Plus grand rowid event_ticket lu : point de reprise de la relecture incrémentale
+    dernier_rowid: int
+    # Intervalles [debut, fin) de chaque statut regroupés par clé agent * len(STATUTS) + statut :
+    # debuts et fins triés séparément à l'intérieur de chaque groupe
+    groupes: Dict[int, Tuple[np.ndarray, np.ndarray]]
+
+    @classmethod
+    def build(
+        cls,
+        tickets: np.ndarray,
+        agents: np.ndarray,
+        dates: np.ndarray,
+        statuts: np.ndarray,
+        versions: Tuple[int, int],
+        dernier_rowid: int
+    ) -> "_Colonnes":
+        return cls(
+            tickets=tickets,
+            agents=agents,
+            dates=dates,
+            statuts=statuts,
+            versions=versions,
+            dernier_rowid=dernier_rowid,
+            groupes=_grouper(*_intervalles(tickets, agents, dates, statuts))
+        )
+
+    @classmethod
+    def from_rows(cls, rows: list, versions: Tuple[int, int]) -> "_Colonnes":
+        return cls.build(*_rows_to_arrays(rows), versions, _dernier_rowid(rows, -1))
+
+    def merge(
+        self,
+        tickets: np.ndarray,
+        agents: np.ndarray,
+        dates: np.ndarray,
+        statuts: np.ndarray,
+        versions: Tuple[int, int],
+        dernier_rowid: int
+    ) -> "_Colonnes":
+        """Ajouter des événements sans retrier le journal.
+
+        Seuls les tickets touchés sont recalculés : leurs anciens intervalles sont
+        retirés des groupes et les nouveaux y sont insérés à leur place. Un
+        événement antidaté peut ainsi raccourcir l'intervalle qui le précède.
+        """
+        touches = np.isin(self.tickets, np.unique(tickets))
+        anciens = (self.tickets[touches], self.agents[touches], self.dates[touches], self.statuts[touches])
+        retires = _grouper(*_intervalles(*anciens))
+        ajoutes = _grouper(*_intervalles(
+            *(np.concatenate((ancien, nouveau)) for ancien, nouveau in zip(anciens, (tickets, agents, dates, statuts)))
+        ))
+
+        groupes = dict(self.groupes)
+        for cle in retires.keys() | ajoutes.keys():
+            debuts, fins = groupes.get(cle, (_VIDE, _VIDE))
+            if cle in retires:
+                debuts, fins = _retirer(debuts, retires[cle][0]), _retirer(fins, retires[cle][1])
+            if cle in ajoutes:
+                debuts, fins = _inserer(debuts, ajoutes[cle][0]), _inserer(fins, ajoutes[cle][1])
+            if len(debuts):
+                groupes[cle] = (debuts, fins)
+            else:
+                groupes.pop(cle, None)
+
+        return _Colonnes(
+            tickets=np.concatenate((self.tickets, tickets)),
+            agents=np.concatenate((self.agents, agents)),
+            dates=np.concatenate((self.dates, dates)),
+            statuts=np.concatenate((self.statuts, statuts)),
+            versions=versions,
+            dernier_rowid=dernier_rowid,
+            groupes=groupes
+        )
+
+
+def _dernier_rowid(rows: list, defaut: int) -> int:
+    """Plus grand rowid des lignes lues (defaut si aucune)"""
+    return max((row[4] for row in rows), default=defaut)
+
+
+def _rows_to_arrays(rows: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Convertir les lignes (Ticket_id, Agent_id, Date_event, statut, rowid) en tableaux"""
+    n = len(rows)
+    tickets = np.fromiter((row[0] for row in rows), dtype=np.int64, count=n)
+    agents = np.fromiter((row[1] for row in rows), dtype=np.int64, count=n)
+    dates = _to_us([row[2] for row in rows]) if n else np.empty(0, dtype=np.int64)
+    statuts = np.fromiter((_STATUT_CODES[row[3]] for row in rows), dtype=np.int64, count=n)
+    return tickets, agents, dates, statuts
+
+
+class EventSnapshot:
+    """Instantané en mémoire du journal event_ticket pour les requêtes « à la date T ».
+
+    Le rafraîchissement suit les compteurs de version de crud : aucun travail si
+    rien n'a changé, relecture des seuls événements insérés depuis la lecture
+    précédente (rowid croissant, quelle que soit leur date) après des créations,
+    reconstruction complète après une suppression.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._colonnes: Optional[_Colonnes] = None
+
+    def refresh(self, db: Session) -> _Colonnes:
+        """Mettre l'instantané à jour si la base a changé depuis la dernière lecture"""
+        # Versions lues avant les événements : une écriture concurrente sera vue au prochain appel
+        versions = (
+            crud.get_collection_version(db, "ticket")[0],
+            crud.get_collection_version(db, "suppression")[0]
+        )
+        with self._lock:
+            colonnes = self._colonnes
+            if colonnes is not None and colonnes.versions == versions:
+                return colonnes
+
+            if colonnes is None or colonnes.versions[1] != versions[1]:
+                colonnes = _Colonnes.from_rows(crud.get_event_log(db), versions)
+            else:
+                # Ajouter les événements insérés depuis la lecture précédente
+                rows = crud.get_event_log(db, apres_rowid=colonnes.dernier_rowid)
+                colonnes = colonnes.merge(
+                    *_rows_to_arrays(rows), versions, _dernier_rowid(rows, colonnes.dernier_rowid)
+                )
+            self._colonnes = colonnes
+            return colonnes
+
+    def backlog_as_of(
+        self,
+        db: Session,
+        instants: List[datetime],
+        statuts: List[Model.StatutEnum]
+    ) -> List[dict]:
+        """Nombre de tickets par agent et par statut à chacun des instants demandés"""
+        colonnes = self.refresh(db)
+        instants_us = _to_us(instants)
+        codes = [_STATUT_CODES[statut] for statut in statuts]
+
+        # Pour chaque groupe (agent, statut) : débuts <= T moins fins <= T,
+        # calculés pour tous les instants à la fois
+        cles = np.array(
+            [cle for cle in sorted(colonnes.groupes) if cle % len(STATUTS) in codes], dtype=np.int64
+        )
+        comptes = np.zeros((len(cles), len(instants_us)), dtype=np.int64)
+        for g, cle in enumerate(cles.tolist()):
+            debuts, fins = colonnes.groupes[cle]
+            comptes[g] = (
+                np.searchsorted(debuts, instants_us, side="right")
+                - np.searchsorted(fins, instants_us, side="right")
+            )
+
+        groupes_statut = cles % len(STATUTS)
+        totaux = {
+            STATUTS[code].value: comptes[groupes_statut == code].sum(axis=0).tolist()
+            for code in codes
+        }
+        agent_ids = (cles // len(STATUTS)).tolist()
+        libelles = [STATUTS[code].value for code in groupes_statut.tolist()]
+
+        resultats = []
+        for i, instant in enumerate(instants):
+            ligne = comptes[:, i]
+            non_nuls = np.flatnonzero(ligne)
+            par_agent: Dict[int, Dict[str, int]] = {}
+            for g, compte in zip(non_nuls.tolist(), ligne[non_nuls].tolist()):
+                par_agent.setdefault(agent_ids[g], {})[libelles[g]] = compte
+            resultats.append({
+                "at": instant,
+                "par_agent": par_agent,
+                "total": {statut: valeurs[i] for statut, valeurs in totaux.items()}
+            })
+        return resultats